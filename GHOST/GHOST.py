@@ -1,4 +1,5 @@
 import os
+import csv
 import qt
 import slicer
 import vtk
@@ -102,7 +103,19 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
         filePath = os.path.join(saveDirectory, 'GHOST')
 
         if voxelArray is not None:
-            self.saveAsMCNPLattice(voxelArray, segmentNames, filePath, spacingValue, useGy, useMeV, npsValue)
+            voxelStats = self.saveAsMCNPLattice(voxelArray, segmentNames, filePath, spacingValue, useGy, useMeV, npsValue)
+            self.saveVoxelStatisticsCSV(voxelStats, os.path.join(saveDirectory, 'GHOST_statistics.csv'))
+
+            # Avisa sobre segmentos vazios após a reamostragem ou sem material no banco de dados
+            emptySegments = [row['name'] for row in voxelStats[1:] if row['voxels'] == 0]
+            missingMaterials = [row['name'] for row in voxelStats[1:] if row['density'] is None]
+            warnings = []
+            if emptySegments:
+                warnings.append("The following segments have no voxels after resampling:\n" + "\n".join(emptySegments))
+            if missingMaterials:
+                warnings.append("The following segments have no material in materials.txt:\n" + "\n".join(missingMaterials))
+            if warnings:
+                slicer.util.warningDisplay("\n\n".join(warnings))
             slicer.util.infoDisplay(f"File saved successfully in: {filePath}")
         else:
             slicer.util.errorDisplay("Failed to generate voxel matrix.")
@@ -166,6 +179,7 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
     def saveAsMCNPLattice(self, voxelArray, segmentNames, file_path, spacingValue, useGy, useMeV, npsValue):
         # Carregar materiais do arquivo materials.txt
         materials_dict = self.load_materials(self.resourcePath('database/materials.txt'))
+        voxelStats = self.computeVoxelStatistics(voxelArray, segmentNames, spacingValue, materials_dict)
 
        
         with open(file_path, 'w') as file:
@@ -178,6 +192,12 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
             file.write(f"c     Tamanho da matriz de voxel  : {voxelArray.shape[2]} x {voxelArray.shape[1]} x {voxelArray.shape[0]}\n")
             file.write(f"c     Resolução dos voxels        : {spacingValue[0]/10}mm x {spacingValue[1]/10}mm x {spacingValue[2]/10}mm\n")
             file.write("c    ---------------------------------------------------------------------------\n")
+            # Tabela de estatísticas por universo (contagem, volume e massa)
+            file.write(f"c     {'Universo':<8s}  {'Segmento':<24s}  {'Voxels':>9s}  {'Volume(cm3)':>11s}  {'Massa(g)':>10s}\n")
+            for row in voxelStats:
+                mass = f"{row['mass']:.4e}" if row['mass'] is not None else "n/a"
+                file.write(f"c     {row['universe']:<8d}  {row['name'][:24]:<24s}  {row['voxels']:>9d}  {row['volume']:>11.4e}  {mass:>10s}\n")
+            file.write("c    ---------------------------------------------------------------------------\n")
             file.write("c ********************* Cell Cards *********************\n")
             file.write("1000 0 1 -2 3 -4 5 -6 fill=999 imp:p=1 imp:e=1 $ $ cell containing the phantom\n")
             file.write("2000 0 -20 11 -40 13 -50 15 lat=1 u=999 imp:p=1 imp:e=1\n")
@@ -280,7 +300,7 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
 
             # Adicionar os tally F6 para cada material
             file.write("c --- Tally f6 Energy Deposition ---\n")
-            self.addTallyF6(file, segmentNames, useGy, useMeV)
+            self.addTallyF6(file, segmentNames, useGy, useMeV, voxelStats)
 
             file.write(f'nps {npsValue}\n')
 
@@ -288,6 +308,61 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
             file.write("c --- End of File ---\n")
             file.write('\n')
 
+        return voxelStats
+
+    def computeVoxelStatistics(self, voxelArray, segmentNames, spacingValue, materials_dict):
+        """
+        Calcula a contagem de voxels, o volume (cm³) e a massa (g) de cada universo da lattice.
+        """
+        # Universo 1 é o ar (voxels com valor 0) e os segmentos começam no universo 2
+        numUniverses = len(segmentNames) + 2
+        counts = np.zeros(numUniverses, dtype=np.int64)
+
+        # Contagem em blocos de fatias para limitar o uso de memória em matrizes muito grandes
+        sliceVoxels = max(1, voxelArray[0].size)
+        slicesPerChunk = max(1, (1 << 24) // sliceVoxels)
+        for start in range(0, voxelArray.shape[0], slicesPerChunk):
+            chunk = voxelArray[start:start + slicesPerChunk].ravel()
+            counts += np.bincount(chunk.astype(np.intp, copy=False), minlength=numUniverses)[:numUniverses]
+
+        counts[1] += counts[0]  # Voxels vazios são preenchidos com o universo 1 (ar)
+        voxelVolume = spacingValue[0] * spacingValue[1] * spacingValue[2]
+
+        voxelStats = [{
+            'universe': 1,
+            'name': 'Air',
+            'voxels': int(counts[1]),
+            'volume': counts[1] * voxelVolume,
+            'density': 1.205e-3,
+            'mass': counts[1] * voxelVolume * 1.205e-3,
+        }]
+        for idx, segmentName in enumerate(segmentNames, start=2):
+            material_info = materials_dict.get(segmentName)
+            density = material_info['density'] if material_info else None
+            volume = counts[idx] * voxelVolume
+            voxelStats.append({
+                'universe': idx,
+                'name': segmentName,
+                'voxels': int(counts[idx]),
+                'volume': volume,
+                'density': density,
+                'mass': volume * density if density is not None else None,
+            })
+
+        return voxelStats
+
+    def saveVoxelStatisticsCSV(self, voxelStats, file_path):
+        """
+        Salva a tabela de estatísticas por universo em um arquivo CSV.
+        """
+        with open(file_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['universe', 'segment', 'voxels', 'volume_cm3', 'density_g_cm3', 'mass_g'])
+            for row in voxelStats:
+                density = f"{row['density']:.6e}" if row['density'] is not None else ""
+                mass = f"{row['mass']:.6e}" if row['mass'] is not None else ""
+                writer.writerow([row['universe'], row['name'], row['voxels'], f"{row['volume']:.6e}", density, mass])
+
     def create_fill_lines(self, voxelArray):
         """
         Função que cria linhas compactadas para o preenchimento do FILL de acordo com o formato do MCNP.
@@ -385,12 +460,20 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
 
         return materials
 
-    def addTallyF6(self, file, segmentNames,useGy, useMeV):
+    def addTallyF6(self, file, segmentNames, useGy, useMeV, voxelStats):
             """
-            Adiciona as entradas de tally F6 e FM6 para cada material no arquivo MCNP.
+            Adiciona as entradas de tally F6, SD6 e FM6 para cada material no arquivo MCNP.
             """
             for idx, segmentName in enumerate(segmentNames, start=2):
                 file.write(f"c\n")
+                # A massa do órgão inteiro vem das estatísticas de voxels; sem ela o tally não é normalizável
+                mass = voxelStats[idx - 1]['mass']
+                if voxelStats[idx - 1]['voxels'] == 0:
+                    file.write(f"c Tally for {segmentName} skipped: no voxels after resampling\n")
+                    continue
+                if mass is None:
+                    file.write(f"c Tally for {segmentName} skipped: material not found in materials.txt\n")
+                    continue
                 file.write(f"fc{idx}6 {segmentName}\n")
                 # Adiciona os tallys para todas as células associadas ao material
                 cell_numbers = [str(cell_id+1) for cell_id in range((idx - 1), idx)]
@@ -400,6 +483,8 @@ class GHOSTWidget(ScriptedLoadableModuleWidget):
                     file.write(f"fm{idx}6 {conversion_factor} $ Conversão para Gy para {segmentName}\n")   
                 if not useGy and useMeV:
                     file.write(f"f{idx}6:p (({' '.join(cell_numbers)}) < {1000})\n")                
+                # O tally de estrutura repetida divide pela massa de um único voxel; usa a massa do órgão
+                file.write(f"sd{idx}6 {mass:.6e} $ Massa (g) de {segmentName}\n")
 
     def openSegmentEditor(self):
         """